@@ -1,45 +1,143 @@
 # ---------- Imports ----------
 import asyncio
+import atexit
+import functools
+import json
+import logging
 import os
+import queue
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from datetime import datetime, date
 
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
-from gspread_dataframe import get_as_dataframe
+from python_calamine import CalamineWorkbook
 from telegram import Update, InputFile, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, ConversationHandler,
     ContextTypes, filters
 )
-from requests import get
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # optional, and not available on Windows
+    uvloop = None
+
 # ---------- Configuration ----------
 load_dotenv()
 
-import logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+# httpx logs every Telegram and NBG request at INFO, including the bot token in the URL
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Let slices share data until written to (always on from pandas 3.0)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 # Create data collection directory if it doesn't exist
 os.makedirs('data_logs', exist_ok=True)
 
+RATES_CACHE_PATH = os.path.join('data_logs', 'rates_cache.json')
+NBG_RATES_URL = "https://nbg.gov.ge/gw/api/ct/monetarypolicy/currencies/en/json/"
+NBG_MAX_CONCURRENCY = 5  # concurrent requests to nbg.gov.ge across all users
+NBG_RETRIES = 3
+NBG_RETRY_BACKOFF = 0.3  # seconds, doubled after each retry
+NBG_RETRY_STATUSES = {429, 500, 502, 503, 504}
+TODAY_RATE_TTL = 3600  # seconds; rates for today and later may still be revised
+BLOCKING_IO_WORKERS = min(8, os.cpu_count() or 4)  # threads for workbook parsing and Google Sheets reads
+
 # ---------- Data Collection Functions ----------
+USER_DATA_LOG_PATH = 'user_data.log'
+ERRORS_LOG_PATH = 'errors.log'
+DATA_LOG_BUFFER_SIZE = 65536
+DATA_LOG_FLUSH_INTERVAL = 1.0  # seconds
+
+# Log lines are queued by the handlers and appended by a background thread that
+# keeps each log file open and flushes it at most once per DATA_LOG_FLUSH_INTERVAL,
+# so file I/O never blocks the event loop.
+_data_log_queue = queue.Queue(maxsize=10000)
+
+def _queue_data_log_line(path: str, line: str) -> None:
+    """Queue a line to be appended to a data collection log file."""
+    try:
+        _data_log_queue.put_nowait((path, line))
+    except queue.Full:
+        logger.error(f"Data log queue is full, dropping entry for {path}")
+
+def _data_log_writer() -> None:
+    """Append queued log lines to long-lived buffered files, flushing periodically."""
+    files = {}
+    flush_deadline = None
+    try:
+        while True:
+            timeout = None if flush_deadline is None else max(0.0, flush_deadline - time.monotonic())
+            try:
+                item = _data_log_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            
+            if item:
+                path, line = item
+                try:
+                    f = files.get(path)
+                    if f is None:
+                        # backslashreplace keeps an unencodable character from failing the line
+                        f = files[path] = open(path, 'a', encoding='utf-8', errors='backslashreplace',
+                                               buffering=DATA_LOG_BUFFER_SIZE)
+                    f.write(line)
+                except Exception as e:  # one bad line must not stop the writer thread
+                    logger.error(f"Failed to write {path}: {e}")
+                if flush_deadline is None:
+                    flush_deadline = time.monotonic() + DATA_LOG_FLUSH_INTERVAL
+            
+            if flush_deadline is not None and time.monotonic() >= flush_deadline:
+                for path, f in files.items():
+                    try:
+                        f.flush()
+                    except Exception as e:  # keep flushing the other files and keep running
+                        logger.error(f"Failed to flush {path}: {e}")
+                flush_deadline = None
+    finally:
+        for path, f in files.items():
+            try:
+                f.close()
+            except Exception as e:
+                logger.error(f"Failed to close {path}: {e}")
+
+_data_log_thread = threading.Thread(target=_data_log_writer, name='data-log-writer', daemon=True)
+_data_log_thread.start()
+
+@atexit.register
+def _stop_data_log_writer() -> None:
+    """Flush pending log lines and close the log files before the interpreter exits."""
+    if _data_log_thread.is_alive():
+        _data_log_queue.put(None)
+        _data_log_thread.join(timeout=5)
+
 def log_user_start(user_id: int, username: str = None, first_name: str = None, last_name: str = None):
     """Log when a user starts the bot."""
     try:
         timestamp = datetime.now().isoformat()
         details = f"last_name={last_name or 'N/A'}"
-        with open('user_data.log', 'a', encoding='utf-8') as f:
-            f.write(
-                f"{timestamp} | USER_START | {user_id} | {username or 'N/A'} | {first_name or 'N/A'} | {details}\n"
-            )
+        _queue_data_log_line(
+            USER_DATA_LOG_PATH,
+            f"{timestamp} | USER_START | {user_id} | {username or 'N/A'} | {first_name or 'N/A'} | {details}\n"
+        )
     except Exception as e:
         logger.error(f"Failed to log user start: {e}")
 
@@ -47,10 +145,10 @@ def log_error(error_type: str, error_message: str, user_id: int = None, context:
     """Log errors with context."""
     try:
         timestamp = datetime.now().isoformat()
-        with open('errors.log', 'a', encoding='utf-8') as f:
-            f.write(
-                f"{timestamp} | {user_id or 'N/A'} | {error_type} | {error_message} | {context or 'N/A'}\n"
-            )
+        _queue_data_log_line(
+            ERRORS_LOG_PATH,
+            f"{timestamp} | {user_id or 'N/A'} | {error_type} | {error_message} | {context or 'N/A'}\n"
+        )
     except Exception as e:
         logger.error(f"Failed to log error: {e}")
 
@@ -65,10 +163,10 @@ def log_user_action(
     """Log user actions for analytics."""
     try:
         timestamp = datetime.now().isoformat()
-        with open('user_data.log', 'a', encoding='utf-8') as f:
-            f.write(
-                f"{timestamp} | {action.upper()} | {user_id} | {username or 'N/A'} | {first_name or 'N/A'} | {details or 'N/A'}\n"
-            )
+        _queue_data_log_line(
+            USER_DATA_LOG_PATH,
+            f"{timestamp} | {action.upper()} | {user_id} | {username or 'N/A'} | {first_name or 'N/A'} | {details or 'N/A'}\n"
+        )
     except Exception as e:
         logger.error(f"Failed to log user action: {e}")
 
@@ -79,40 +177,53 @@ AWAIT_FILE = 2
 AWAIT_PREV_AMOUNT = 3
 
 ALLOWED_CURRENCIES = {"GEL", "EUR", "USD"}
-ALLOWED_SOURCES = {
-    "Bank transaction",
-    "POS terminal payment", 
-    "Cash",
-    "Payment system: PayPal, Wise, Deel, etc.",
+# Declaration field each income source is reported in
+SOURCE_TO_FIELD = {
+    "Cash": "Field 18",
+    "POS terminal payment": "Field 19",
+    "Bank transaction": "Field 20",
+    "Payment system: PayPal, Wise, Deel, etc.": "Field 21",
 }
+ALLOWED_SOURCES = set(SOURCE_TO_FIELD)
+
+REQUIRED_COLUMNS = ['Transaction amount', 'Currency', 'Transaction date', 'Income source']
+
+# Russian template headers mapped to the English names used in processing
+COLUMN_MAPPING = {
+    'Сумма транзакции': 'Transaction amount',
+    'Валюта': 'Currency',
+    'Дата транзакции': 'Transaction date',
+    'Источник дохода': 'Income source',
+}
+DATE_FORMAT = "%d.%m.%Y"  # matches 14.08.2025
+SHEET_ID_PATTERN = re.compile(r"/d/([a-zA-Z0-9_-]+)")
+SHEET_RANGES = ['A1:Z1', 'A2:Z']  # header and transactions of the first sheet
+NON_NUMERIC_PATTERN = re.compile(r"[^\d,.\-]")
+FILE_COLUMN_DTYPES = {'Currency': 'string', 'Income source': 'string'}
 
 # ---------- Utility Functions ----------
-def to_num(s):
-    """Convert string to numeric value, handling various formats."""
-    if pd.isna(s): 
-        return pd.NA
-    s = str(s).strip()
-    s = re.sub(r"[^\d,.\-]", "", s)       # drop currency/whitespace
-    if s.count(",")==1 and "." not in s:  # handle 1,23 -> 1.23
-        s = s.replace(",", ".")
-    return pd.to_numeric(s, errors="coerce")
+def to_num(s: pd.Series) -> pd.Series:
+    """Convert a Series of strings to numeric values, handling various formats."""
+    s = s.astype("string").str.strip()
+    s = s.str.replace(NON_NUMERIC_PATTERN, "", regex=True)  # drop currency/whitespace
+    decimal_comma = (s.str.count(",").eq(1) & ~s.str.contains(".", regex=False)).fillna(False)
+    s = s.mask(decimal_comma, s.str.replace(",", ".", regex=False))  # handle 1,23 -> 1.23
+    return pd.to_numeric(s, errors="coerce").astype("float64")
+
+def to_allowed_category(s: pd.Series, allowed: set) -> pd.Series:
+    """Convert a column to a categorical over the allowed values, rejecting anything else."""
+    values = pd.Categorical(s, categories=sorted(allowed))
+    unknown = values.isna()
+    if unknown.any():
+        invalid = sorted({'(empty)' if pd.isna(v) else str(v) for v in s[unknown]})
+        raise ValueError(f"Invalid {s.name}: {', '.join(invalid)}")
+    return pd.Series(values, index=s.index, name=s.name)
 
 def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
-    """Normalize Russian column names to English for processing."""
-    column_mapping = {
-        'Сумма транзакции': 'Transaction amount',
-        'Валюта': 'Currency',
-        'Дата транзакции': 'Transaction date',
-        'Источник дохода': 'Income source'
-    }
-    
-    # Create a copy to avoid modifying original
-    df_normalized = df.copy()
-    
-    # Rename columns using the mapping
-    df_normalized.columns = [column_mapping.get(col, col) for col in df_normalized.columns]
-    
-    return df_normalized
+    """Normalize Russian column names to English for processing (in place)."""
+    # Only the column labels change, so rename in place instead of copying the data
+    df.rename(columns=COLUMN_MAPPING, inplace=True)
+    return df
 
 def crop_to_last_transaction(df: pd.DataFrame) -> pd.DataFrame:
     """Crop DataFrame to remove empty rows after the last filled transaction."""
@@ -126,79 +237,274 @@ def crop_to_last_transaction(df: pd.DataFrame) -> pd.DataFrame:
     if amount_col is None:
         return df
     
-    # Find the last row with a non-null Transaction amount
-    last_filled_idx = df[amount_col].last_valid_index()
+    # Find the position of the last row with a non-null Transaction amount
+    filled = np.flatnonzero(df[amount_col].notna().to_numpy())
     
-    if last_filled_idx is not None:
+    if filled.size > 0:
         # Crop the DataFrame to include only up to the last filled row
-        df = df.iloc[:last_filled_idx + 1].copy()
+        df = df.iloc[:filled[-1] + 1]
     
     return df
 
-def get_currency_rate(currency: str, on_date: date) -> float:
+# ---------- Currency Rates ----------
+_nbg_semaphore = None
+_pending_rates = {}  # (currency, date) -> task fetching that date's rates
+
+def get_nbg_semaphore() -> asyncio.Semaphore:
+    """Return the NBG concurrency limit, creating it inside the running loop.
+    
+    On Python 3.9 a Semaphore binds to the loop current at construction, so it
+    can't be built at import, before main() installs the uvloop loop.
+    """
+    global _nbg_semaphore
+    if _nbg_semaphore is None:
+        _nbg_semaphore = asyncio.Semaphore(NBG_MAX_CONCURRENCY)
+    return _nbg_semaphore
+
+def build_http_client() -> httpx.AsyncClient:
+    """Build the keep-alive HTTP/2 client shared by all NBG requests."""
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=NBG_RETRIES,  # connection failures only
+        limits=httpx.Limits(
+            max_connections=NBG_MAX_CONCURRENCY,
+            max_keepalive_connections=NBG_MAX_CONCURRENCY,
+        ),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=10)
+
+async def get_currency_rates_on_date(client: httpx.AsyncClient, on_date: str, currencies: list) -> dict:
     """
-    Get currency exchange rate from Georgian National Bank API.
+    Get exchange rates for several currencies on one date from Georgian National Bank API.
+    
+    The API accepts repeated currencies parameters, so a single request covers
+    every currency needed for the date.
     
     Args:
-        currency (str): Currency code (e.g., 'USD', 'EUR')
-        on_date (date): Date for which to get the exchange rate
+        client (httpx.AsyncClient): Shared HTTP client
+        on_date (str): Date for which to get the exchange rates (YYYY-MM-DD)
+        currencies (list): Currency codes (e.g., ['USD', 'EUR'])
         
     Returns:
-        float: Exchange rate to GEL
+        dict: {currency: exchange rate to GEL}
         
     Raises:
-        Exception: If API request fails or currency not found
+        Exception: If API request fails or a currency is not found
     """
-    if currency == 'GEL':
-        return 1.0
+    rates = {currency: 1.0 for currency in currencies if currency == 'GEL'}
+    foreign = [currency for currency in currencies if currency != 'GEL']
+    if not foreign:
+        return rates
     
     try:
-        address = f"https://nbg.gov.ge/gw/api/ct/monetarypolicy/currencies/en/json/?currencies={currency}&date={on_date}"
-        response = get(address)
+        params = [('currencies', currency) for currency in foreign] + [('date', on_date)]
+        async with get_nbg_semaphore():
+            for attempt in range(NBG_RETRIES + 1):
+                response = await client.get(NBG_RATES_URL, params=params)
+                if response.status_code not in NBG_RETRY_STATUSES or attempt == NBG_RETRIES:
+                    break
+                await asyncio.sleep(NBG_RETRY_BACKOFF * 2 ** attempt)
         response.raise_for_status()  # Raise an exception for bad status codes
         
-        data = response.json()
-        if data and len(data) > 0 and 'currencies' in data[0] and len(data[0]['currencies']) > 0:
-            rate = data[0]['currencies'][0]['rate']
-            print(f"📈 {currency} rate on {on_date}: {rate}")
-            return float(rate)
-        else:
-            raise ValueError(f"No rate data found for {currency} on {on_date}")
+        data = orjson.loads(response.content)
+        entries = data[0].get('currencies', []) if data else []
+        found = {entry['code']: float(entry['rate']) for entry in entries}
+        for currency in foreign:
+            if currency not in found:
+                raise ValueError(f"No rate data found for {currency} on {on_date}")
+            rates[currency] = found[currency]
+            logger.debug("📈 %s rate on %s: %s", currency, on_date, found[currency])
+        return rates
             
     except Exception as e:
-        print(f"❌ Error getting rate for {currency} on {on_date}: {e}")
+        logger.warning("❌ Error getting rates for %s on %s: %s", ", ".join(foreign), on_date, e)
         raise
 
+def load_rate_cache(path: str = RATES_CACHE_PATH) -> dict:
+    """Load cached NBG rates from disk as {(currency, 'YYYY-MM-DD'): rate}."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable rate cache {path}: {e}")
+        return {}
+    # Older versions could cache rates fetched for unparsed (NaT) dates; drop them
+    return {
+        tuple(key.split('|', 1)): float(rate)
+        for key, rate in raw.items() if not key.endswith('|nan')
+    }
+
+def save_rate_cache(path: str = RATES_CACHE_PATH) -> None:
+    """Persist the in-memory rate cache to disk (runs in a worker thread)."""
+    # Saves may overlap; the lock keeps them off the same tmp file, and copying
+    # inside it means the last writer always stores the newest snapshot
+    with _rate_cache_lock:
+        snapshot = _RATE_CACHE.copy()
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({f"{c}|{d}": rate for (c, d), rate in snapshot.items()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to save rate cache: {e}")
+
+# Historical NBG rates never change, so they are cached for the process lifetime
+# and across restarts. Rates for today and future dates aren't fixed yet, so they
+# are only kept in memory for TODAY_RATE_TTL seconds.
+_RATE_CACHE = load_rate_cache()
+_rate_cache_lock = threading.Lock()
+_todays_rates = {}  # (currency, today or later date) -> (rate, fetched_at)
+
+async def get_currency_rates(client: httpx.AsyncClient, pairs) -> dict:
+    """
+    Get exchange rates for unique (currency, date) pairs, using the rate cache.
+    
+    Missing rates are fetched with one request per date, with the dates fetched
+    concurrently. A rate that is already being fetched for another upload is
+    awaited instead of requested again.
+    
+    Args:
+        client (httpx.AsyncClient): Shared HTTP client
+        pairs: Iterable of (currency, 'YYYY-MM-DD') tuples
+        
+    Returns:
+        dict: {(currency, on_date): rate}
+    """
+    rates = {}
+    missing = []
+    today = date.today().isoformat()
+    now = time.monotonic()
+    for currency, on_date in pairs:
+        key = (currency, on_date)
+        if key in _RATE_CACHE:
+            rates[key] = _RATE_CACHE[key]
+        elif on_date >= today and key in _todays_rates and now - _todays_rates[key][1] < TODAY_RATE_TTL:
+            rates[key] = _todays_rates[key][0]
+        else:
+            missing.append(key)
+    
+    logger.info(f"Rate cache: {len(rates)} hits, {len(missing)} misses")
+    if not missing:
+        return rates
+    
+    # One request per date covers all of its currencies, and concurrent uploads
+    # asking for the same rate share that request
+    by_date = {}
+    for currency, on_date in missing:
+        if (currency, on_date) not in _pending_rates:
+            by_date.setdefault(on_date, []).append(currency)
+    for on_date, currencies in by_date.items():
+        keys = [(currency, on_date) for currency in currencies]
+        task = asyncio.ensure_future(get_currency_rates_on_date(client, on_date, currencies))
+        for key in keys:
+            _pending_rates[key] = task
+        task.add_done_callback(lambda _, keys=keys: [_pending_rates.pop(key, None) for key in keys])
+    key_tasks = {key: _pending_rates[key] for key in missing}
+    tasks = list(dict.fromkeys(key_tasks.values()))
+    
+    # Shield the shared tasks so a canceled upload doesn't cancel them for others
+    results = await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+    fetched = dict(zip(tasks, results))  # task -> {currency: rate}
+    
+    cache_updated = False
+    now = time.monotonic()
+    for currency, on_date in missing:
+        rate = fetched[key_tasks[(currency, on_date)]][currency]
+        rates[(currency, on_date)] = rate
+        if currency == 'GEL':
+            continue
+        if on_date >= today:  # ISO dates compare chronologically as strings
+            _todays_rates[(currency, on_date)] = (rate, now)
+        else:
+            _RATE_CACHE[(currency, on_date)] = rate
+            cache_updated = True
+    
+    if cache_updated:
+        await asyncio.to_thread(save_rate_cache)
+    return rates
+
+# ---------- Tax Data Processing ----------
 def get_tax_dataframe_from_file(file_bytes: BytesIO) -> pd.DataFrame:
     """Read and validate tax data from .xlsx file bytes."""
-    df = pd.read_excel(BytesIO(file_bytes), sheet_name='Data')
-    
-    # Normalize column names (Russian to English)
-    df = normalize_column_names(df)
-    df = crop_to_last_transaction(df)
+    with CalamineWorkbook.from_filelike(BytesIO(file_bytes)) as workbook:
+        rows = workbook.get_sheet_by_name('Data').iter_rows()
+        
+        # Normalize column names (Russian to English) and validate required columns
+        header = [COLUMN_MAPPING.get(col, col) for col in next(rows, [])]
+        for col in REQUIRED_COLUMNS:
+            if col not in header:
+                raise ValueError(f"Missing required column: {col}")
+        indices = [i for i, col in enumerate(header) if col in REQUIRED_COLUMNS]
+        amount_pos = [header[i] for i in indices].index('Transaction amount')
+        
+        # Stream rows, holding back empty ones until a filled transaction follows,
+        # so the empty tail of the sheet is never materialized
+        data = []
+        pending = []
+        for row in rows:
+            record = [row[i] if row[i] != '' else None for i in indices]
+            if record[amount_pos] is None:
+                pending.append(record)
+            else:
+                data.extend(pending)
+                pending.clear()
+                data.append(record)
     
-    # Validate required columns
-    required_columns = ['Transaction amount', 'Currency', 'Transaction date', 'Income source']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
+    # Build each column with its final dtype instead of inferring an object frame
+    columns = [header[i] for i in indices]
+    values = zip(*data) if data else ([] for _ in columns)
+    df = pd.DataFrame({
+        col: pd.Series(vals, dtype=FILE_COLUMN_DTYPES.get(col, 'object'))
+        for col, vals in zip(columns, values)
+    })
     
+    # Numeric cells arrive as floats already; only text amounts need cleaning
+    amounts = df['Transaction amount']
+    numeric = pd.to_numeric(amounts, errors='coerce').astype('float64')
+    text = numeric.isna() & amounts.notna()
+    if text.any():
+        numeric[text] = to_num(amounts[text])
+    df['Transaction amount'] = numeric
     return df
 
+@functools.lru_cache(maxsize=None)
+def get_gspread_client(creds_path: str) -> gspread.Client:
+    """Authorize a Google Sheets client once per service account file."""
+    creds = Credentials.from_service_account_file(
+        creds_path,
+        scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
+    )
+    return gspread.authorize(creds)
+
 def get_tax_dataframe_from_sheet(link: str, creds_path: str) -> pd.DataFrame:
     """Read and validate tax data from Google Sheets."""
-    sheet_id_match = re.search(r"/d/([a-zA-Z0-9_-]+)", link)
+    sheet_id_match = SHEET_ID_PATTERN.search(link)
     if not sheet_id_match:
         raise ValueError("Invalid Google Sheets link")
     sheet_id = sheet_id_match.group(1)
     
-    creds = Credentials.from_service_account_file(
-        creds_path,
-        scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
+    # Fetch the header and the transactions in a single batchGet request
+    response = get_gspread_client(creds_path).http_client.values_batch_get(
+        sheet_id,
+        SHEET_RANGES,
+        params={
+            'valueRenderOption': 'UNFORMATTED_VALUE',
+            'dateTimeRenderOption': 'FORMATTED_STRING',
+        },
     )
-    client = gspread.authorize(creds)
-    sheet = client.open_by_key(sheet_id).sheet1
-    df = get_as_dataframe(sheet, evaluate_formulas=True, header=0)
+    header_range, body_range = response['valueRanges']
+    header = header_range.get('values', [[]])[0]
+    
+    # The API trims trailing empty cells, so pad rows to the header width
+    # and skip rows that are empty altogether
+    rows = []
+    for row in body_range.get('values', []):
+        record = [value if value != '' else None for value in row[:len(header)]]
+        if any(value is not None for value in record):
+            rows.append(record + [None] * (len(header) - len(record)))
+    df = pd.DataFrame(rows, columns=header)
     
     # Normalize column names (Russian to English)
     df = normalize_column_names(df)
@@ -209,27 +515,56 @@ def get_tax_dataframe_from_sheet(link: str, creds_path: str) -> pd.DataFrame:
     # Convert Transaction amount to numeric (handle both original and normalized names)
     amount_col = 'Transaction amount'
     if amount_col in df.columns:
-        df[amount_col] = df[amount_col].map(to_num)
+        df[amount_col] = to_num(df[amount_col])
     
     return df
 
-def process_tax_dataframe(df: pd.DataFrame, prev_month_amount: float = 0.0) -> pd.DataFrame:
+async def process_tax_dataframe(df: pd.DataFrame, http_client: httpx.AsyncClient,
+                                prev_month_amount: float = 0.0) -> pd.DataFrame:
     """Process tax DataFrame with currency conversion and calculations."""
-    print(f"✅ Processing {len(df)} transactions")
+    logger.debug("✅ Processing %d transactions", len(df))
     
-    # Convert transaction dates to proper date format
+    # Parse transaction dates into a native datetime64 column, dropping any time
+    # of day so rows from the same day share one rate lookup
     if 'Transaction date' in df.columns:
-        df['Transaction date'] = pd.to_datetime(df['Transaction date'],
-            format="%d.%m.%Y",   # matches 14.08.2025
+        parsed = pd.to_datetime(df['Transaction date'],
+            format=DATE_FORMAT,
             errors="coerce"      # invalid dates become NaT
-        ).dt.date
+        ).dt.normalize()
+        
+        # A NaT date can't be looked up or cached, so reject it like a bad currency
+        unparsed = parsed.isna()
+        if unparsed.any():
+            invalid = sorted({'(empty)' if pd.isna(v) else str(v) for v in df['Transaction date'][unparsed]})
+            raise ValueError(f"Invalid Transaction date: {', '.join(invalid)} (expected DD.MM.YYYY)")
+        df['Transaction date'] = parsed
+    
+    # Currencies and income sources come from fixed lists, so validate them and
+    # store them as categorical codes
+    df['Currency'] = to_allowed_category(df['Currency'].str.strip().str.upper(), ALLOWED_CURRENCIES)
+    df['Income source'] = to_allowed_category(df['Income source'].str.strip(), ALLOWED_SOURCES)
     
     # Get currency rates for each transaction
-    print("🔄 Fetching currency rates...")
-    df['rate'] = df.apply(lambda row: get_currency_rate(row['Currency'], row['Transaction date']), axis=1)
+    logger.debug("🔄 Fetching currency rates...")
+    # GEL rows keep a rate of 1.0, so only foreign currency rows get lookup keys
+    row_rates = np.ones(len(df))
+    foreign = df['Currency'].ne('GEL').to_numpy()
+    if foreign.any():
+        keys = pd.MultiIndex.from_frame(df.loc[foreign, ['Currency', 'Transaction date']])
+        pairs = keys.unique()
+        currencies = pairs.get_level_values('Currency')
+        on_dates = pairs.get_level_values('Transaction date').strftime('%Y-%m-%d')
+        rates = await get_currency_rates(http_client, zip(currencies, on_dates))
+        pair_rates = np.array([rates[(c, d)] for c, d in zip(currencies, on_dates)])
+        
+        # Gather each row's rate from its position among the unique pairs
+        row_rates[foreign] = pair_rates[pairs.get_indexer(keys)]
+    df['rate'] = row_rates
     
-    # Calculate amounts in GEL
-    df['amount_in_gel'] = df['Transaction amount'] * df['rate']
+    # Calculate amounts in GEL on plain float64 arrays. float32 would halve the
+    # bytes, but its ~7 significant digits lose cents on amounts above 100,000 GEL.
+    amounts = df['Transaction amount'].to_numpy(dtype=np.float64, na_value=np.nan)
+    df['amount_in_gel'] = amounts * df['rate'].to_numpy(dtype=np.float64)
     
     # Calculate totals
     current_month_total = df['amount_in_gel'].sum()
@@ -237,110 +572,33 @@ def process_tax_dataframe(df: pd.DataFrame, prev_month_amount: float = 0.0) -> p
     df.attrs['current_month_total'] = current_month_total
     df.attrs['prev_month_total'] = prev_month_amount
     
-    print(f"💰 Current month total: {current_month_total:,.2f} GEL")
-    print(f"💰 Year-to-date total: {df.attrs['ytd_total']:,.2f} GEL")
+    logger.debug("💰 Current month total: %.2f GEL", current_month_total)
+    logger.debug("💰 Year-to-date total: %.2f GEL", df.attrs['ytd_total'])
     
     return df
 
 def summarize_income(df: pd.DataFrame, prev_amount: float) -> dict:
     """Summarize income by fields for tax declaration."""
-    field15 = df['amount_in_gel'].sum() + prev_amount
-    field18 = df[df['Income source'] == 'Cash']['amount_in_gel'].sum()
-    field19 = df[df['Income source'] == 'POS terminal payment']['amount_in_gel'].sum()
-    field20 = df[df['Income source'] == 'Bank transaction']['amount_in_gel'].sum()
-    field21 = df[df['Income source'] == 'Payment system: PayPal, Wise, Deel, etc.']['amount_in_gel'].sum()
-    
-    return {
-        'Field 15': field15,
-        'Field 18': field18,
-        'Field 19': field19,
-        'Field 20': field20,
-        'Field 21': field21,
-    }
+    totals = df.groupby('Income source', sort=False, observed=True)['amount_in_gel'].sum()
+    # Every row has a validated source, so the source totals add up to the whole period
+    fields = {'Field 15': float(totals.sum()) + prev_amount}
+    fields.update(
+        totals.rename(index=SOURCE_TO_FIELD)
+        .reindex(list(SOURCE_TO_FIELD.values()), fill_value=0.0)
+        .to_dict()
+    )
+    return fields
 
-# ---------- Template Generation ----------
-def build_template_bytes(lang: str = "en") -> BytesIO:
-    """Build an Excel template file for tax data entry."""
-    import xlsxwriter
-    
-    # Create a new workbook and worksheet
-    output = BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-    worksheet = workbook.add_worksheet('Data')
-    
-    # Define formats
-    header_format = workbook.add_format({
-        'bold': True,
-        'bg_color': '#D7E4BC',
-        'border': 1
-    })
-    
-    cell_format = workbook.add_format({
-        'border': 1
-    })
-    
-    date_format = workbook.add_format({
-        'num_format': 'dd.mm.yyyy',
-        'border': 1
-    })
-    
-    # Define headers based on language
-    if lang == "ru":
-        headers = ['Сумма транзакции', 'Валюта', 'Дата транзакции', 'Источник дохода']
-        sample_data = [
-            [1000, 'USD', '01.01.1999', 'Bank transaction'],
-            [500, 'EUR', '02.01.1999', 'Payment system: PayPal, Wise, Deel, etc.'],
-            [200, 'GEL', '03.01.1999', 'Cash'],
-            [300, 'USD', '04.01.1999', 'POS terminal payment'],
-        ]
-    else:
-        headers = ['Transaction amount', 'Currency', 'Transaction date', 'Income source']
-        sample_data = [
-            [1000, 'USD', '01.01.1999', 'Bank transaction'],
-            [500, 'EUR', '02.01.1999', 'Payment system: PayPal, Wise, Deel, etc.'],
-            [200, 'GEL', '03.01.1999', 'Cash'],
-            [300, 'USD', '04.01.1999', 'POS terminal payment'],
-        ]
-    
-    # Write headers
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header, header_format)
-    
-    # Set column widths
-    worksheet.set_column(0, 0, 18)  # Transaction amount
-    worksheet.set_column(1, 1, 10)  # Currency
-    worksheet.set_column(2, 2, 18)  # Transaction date
-    worksheet.set_column(3, 3, 25)  # Income source
-    
-    # Add sample data
-    for row, data in enumerate(sample_data, 1):
-        for col, value in enumerate(data):
-            if col == 2:  # Date column
-                worksheet.write_datetime(row, col, datetime.strptime(value, '%d.%m.%Y'), date_format)
-            else:
-                worksheet.write(row, col, value, cell_format)
-    
-    # Add data validation for currency
-    worksheet.data_validation(1, 1, 1000, 1, {
-        'validate': 'list',
-        'source': ['GEL', 'USD', 'EUR']
-    })
-    
-    # Add data validation for income source
-    income_sources = [
-        'Bank transaction',
-        'POS terminal payment',
-        'Cash',
-        'Payment system: PayPal, Wise, Deel, etc.'
-    ]
-    worksheet.data_validation(1, 3, 1000, 3, {
-        'validate': 'list',
-        'source': income_sources
-    })
-    
-    workbook.close()
-    output.seek(0)
-    return output
+# ---------- Templates ----------
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+def load_template_bytes(lang: str = "en") -> bytes:
+    """Read the prebuilt Excel template for tax data entry."""
+    with open(os.path.join(TEMPLATES_DIR, f'template_{lang}.xlsx'), 'rb') as f:
+        return f.read()
+
+# The templates never change, so each language is read once at import
+TEMPLATE_BYTES = {lang: load_template_bytes(lang) for lang in ("en", "ru")}
 
 def build_instructions() -> str:
     """Build instruction text for the template."""
@@ -415,6 +673,13 @@ def build_detailed_income_instructions_ru() -> str:
         "⚠️ ВАЖНО: Копируйте точный текст из вариантов выше!"
     )
 
+# Instruction texts never change, so they are built once at import
+INSTRUCTIONS = build_instructions()
+DETAILED_INCOME_INSTRUCTIONS = {
+    "en": build_detailed_income_instructions_en(),
+    "ru": build_detailed_income_instructions_ru(),
+}
+
 # ---------- Bot Handlers ----------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle /start command - show language selection."""
@@ -502,8 +767,6 @@ async def receive_template(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         first_name=user.first_name,
     )
     
-    template = build_template_bytes(lang)
-    
     if lang == "ru":
         caption = (
             "📊 БОТ ДЛЯ РАСЧЕТА НАЛОГОВ В ГРУЗИИ\n\n"
@@ -521,17 +784,17 @@ async def receive_template(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         )
         reply = "Отправьте заполненный .xlsx файл или ссылку на Google Sheets."
         sheets_link = "Вы также можете сделать копию шаблона в Google Sheets: https://docs.google.com/spreadsheets/d/1no-hnrWP8mWEREK97oVAUJ4-Ki2GP9wkbgNPEKtfJMo/edit?usp=sharing"
-        detailed_instructions = build_detailed_income_instructions_ru()
+        detailed_instructions = DETAILED_INCOME_INSTRUCTIONS["ru"]
         filename = "налоговый_шаблон.xlsx"
     else:
-        caption = build_instructions()
+        caption = INSTRUCTIONS
         reply = "Send your filled .xlsx file or Google Sheets link."
         sheets_link = "You can also make a copy of the template in Google Sheets: https://docs.google.com/spreadsheets/d/1no-hnrWP8mWEREK97oVAUJ4-Ki2GP9wkbgNPEKtfJMo/edit?usp=sharing"
-        detailed_instructions = build_detailed_income_instructions_en()
+        detailed_instructions = DETAILED_INCOME_INSTRUCTIONS["en"]
         filename = "template.xlsx"
     
     await update.message.reply_document(
-        document=InputFile(template, filename=filename),
+        document=InputFile(TEMPLATE_BYTES[lang], filename=filename),
         caption=caption
     )
     await update.message.reply_text(detailed_instructions)
@@ -566,8 +829,9 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         b = await file.download_as_bytearray()
         
         try:
-            df = get_tax_dataframe_from_file(b)
-            df = process_tax_dataframe(df, prev_month_amount=0.0)
+            # Parsing the workbook is CPU-bound, so keep it off the event loop
+            df = await asyncio.to_thread(get_tax_dataframe_from_file, b)
+            df = await process_tax_dataframe(df, context.bot_data['http'], prev_month_amount=0.0)
             log_user_action(
                 user.id,
                 "file_processed_success",
@@ -595,8 +859,8 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         
         try:
             creds_path = os.getenv('GOOGLE_KEY_PATH', 'service_account.json')
-            df = get_tax_dataframe_from_sheet(link, creds_path)
-            df = process_tax_dataframe(df, prev_month_amount=0.0)
+            df = await asyncio.to_thread(get_tax_dataframe_from_sheet, link, creds_path)
+            df = await process_tax_dataframe(df, context.bot_data['http'], prev_month_amount=0.0)
             log_user_action(
                 user.id,
                 "google_sheet_processed_success",
@@ -622,8 +886,9 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         await update.message.reply_text(msg)
         return AWAIT_FILE
     
-    # Store DataFrame and ask for previous amount
-    context.user_data['tax_df'] = df
+    # Keep only the current period totals and ask for previous amount
+    context.user_data['tax_fields'] = summarize_income(df, 0.0)
+    context.user_data['tax_rows'] = len(df)
     msg = ("Received file. Please send previous period amount (field 15 from previous month declaration) in GEL (e.g., 100000.00)" 
            if lang == "en" else 
            "Файл получен. Пожалуйста, отправьте сумму за предыдущий период (поле 15 из декларации за предыдущий месяц) в GEL (например, 100000.00)")
@@ -654,23 +919,24 @@ async def handle_prev_amount(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text(msg)
         return AWAIT_PREV_AMOUNT
     
-    df = context.user_data.get('tax_df')
-    if df is None:
-        log_error("MissingDataFrame", "No tax DataFrame found in user context", user.id, "calculation")
+    current_fields = context.user_data.get('tax_fields')
+    if current_fields is None:
+        log_error("MissingDataFrame", "No tax totals found in user context", user.id, "calculation")
         msg = ("No tax file found. Send /start to begin." 
                if lang == "en" else 
                "Файл не найден. Отправьте /start для начала.")
         await update.message.reply_text(msg)
         return ConversationHandler.END
     
-    # Calculate fields
-    fields = summarize_income(df, prev_amount)
+    # Add the previous period amount to the year-to-date field
+    fields = dict(current_fields)
+    fields['Field 15'] += prev_amount
     
     # Log successful calculation
     log_user_action(
         user.id,
         "calculation_completed",
-        f"Field15: {fields['Field 15']:.2f}, Transactions: {len(df)}",
+        f"Field15: {fields['Field 15']:.2f}, Transactions: {context.user_data.get('tax_rows', 0)}",
         username=user.username,
         first_name=user.first_name,
     )
@@ -749,25 +1015,66 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
         logger.error(f"Error in error handler: {str(e)}")
 
 # ---------- Main Application ----------
+async def post_init(app: Application) -> None:
+    """Open the shared HTTP client and the thread pool used for blocking I/O."""
+    app.bot_data['http'] = build_http_client()
+    
+    # asyncio.to_thread runs on the default executor, so every handler shares this pool
+    executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix='taxbot-io')
+    asyncio.get_running_loop().set_default_executor(executor)
+    app.bot_data['executor'] = executor
+
+async def post_shutdown(app: Application) -> None:
+    """Close the shared HTTP client and wait for pending blocking work to finish."""
+    client = app.bot_data.pop('http', None)
+    if client is not None:
+        await client.aclose()
+    executor = app.bot_data.pop('executor', None)
+    if executor is not None:
+        executor.shutdown(wait=True)
+
 def main():
     """Main application entry point."""
     token = os.getenv("BOT_TOKEN")
     if not token:
         raise RuntimeError("Set BOT_TOKEN env var.")
 
-    app = Application.builder().token(token).build()
+    # Load Google credentials up front so the first sheet submission doesn't pay for it
+    creds_path = os.getenv('GOOGLE_KEY_PATH', 'service_account.json')
+    if os.path.exists(creds_path):
+        try:
+            get_gspread_client(creds_path)
+        except Exception as e:
+            # Only Google Sheets submissions need it, and lru_cache retries on the next one
+            logger.warning(f"Could not load Google credentials from {creds_path}: {e}")
+
+    # uvloop speeds up the Telegram and NBG round-trips; run_polling picks up the current loop
+    if uvloop is not None:
+        asyncio.set_event_loop(uvloop.new_event_loop())
+
+    app = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(8)
+        .connection_pool_size(16)
+        .pool_timeout(30)
+        .get_updates_connection_pool_size(1)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     conv = ConversationHandler(
         entry_points=[
             CommandHandler("start", start), 
-            MessageHandler(filters.Regex(r'^New tax$|^Новый расчет$'), start)
+            MessageHandler(filters.Text(["New tax", "Новый расчет"]), start)
         ],
         states={
             AWAIT_LANGUAGE: [
-                MessageHandler(filters.Regex(r'^Русский$|^English$'), select_language)
+                MessageHandler(filters.Text(["Русский", "English"]), select_language)
             ],
             AWAIT_SELECTION: [
-                MessageHandler(filters.Regex(r'^Receive template$|^Получить шаблон$'), receive_template)
+                MessageHandler(filters.Text(["Receive template", "Получить шаблон"]), receive_template)
             ],
             AWAIT_FILE: [
                 MessageHandler(